@@ -23,9 +23,11 @@ Last Modified: 2024-09-16
 License: CC BY-NC-SA 4.0
 
 Usage:
-    python download_csye_for_mfa.py [output_directory]
+    python download_csye_for_mfa.py [--force] [output_directory]
 
     If no output directory is specified, it defaults to 'mfa_workspace'.
+    TextGrids already fixed on a previous run are skipped unless --force
+    is given.
 
 Notes:
     - Ensure that ffmpeg is installed and accessible from the command line.
@@ -36,37 +38,118 @@ Notes:
 
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import csv
 import subprocess
 import zipfile
-from io import BytesIO
 import shutil
+import tempfile
 import argparse
-import regex as re
+import hashlib
+import json
+import math
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import re
+import regex
 from praatio import textgrid
 from praatio.utilities.constants import Interval
 import yiddish
 
 AUDIO_FILES_URL = 'https://gist.githubusercontent.com/ibleaman/87217c5a30cb0376782126984c64197f/raw/CSYE-Audio.csv'
 TRANSCRIPTS_ZIP_URL = 'https://github.com/YiddishCorpus/CSYE-Transcripts/archive/main.zip'
-WORD_REGEX = re.compile(r"[\p{L}\-'<>]+")
-FILLERS = ['spn', 'uh', 'ah', 'eh', 'oh', 'uhm', 'ehm', 'mhm', 'hm', 'mm', 'tsk']
+# The regex module is only used for its Unicode classes (\p{L}, and \w below);
+# stdlib re is faster for everything else
+WORD_REGEX = regex.compile(r"[\p{L}\-'<>]+")
+LOWERCASE_REGEX = re.compile(r'[a-z]')
+CAPS_RUN_REGEX = re.compile(r'[A-Z]{2,}')
+STRIP_BRACKETS_TABLE = str.maketrans('', '', '<>')
+FILLERS = frozenset(['spn', 'uh', 'ah', 'eh', 'oh', 'uhm', 'ehm', 'mhm', 'hm', 'mm', 'tsk'])
+
+# Compiled once at import rather than on every call
+BRACKETED_REGEX = re.compile(r'<([^>]+)>')
+# Group 1 matches a word, group 2 a run of punctuation
+TOKEN_REGEX = regex.compile(r"([\p{L}\-']+)|([^\p{L}\s<>]+)")
+
+# Letter classes used as context by the pronunciation rules
+VOWELS = 'אַעייִאָווּײײַױ'
+CONSONANTS = 'בגדהװזטכלמנספּפֿצקרש'
+# A consonant that doesn't start זש/טש (those two letters become ʒ/ʧ)
+CONSONANT = rf'(?!זש|טש)[{CONSONANTS}]'
+
+# All pre-transliteration rules in one alternation, so a word is scanned
+# once. Lookarounds see the original word, so each context accounts for
+# what earlier rules would have rewritten: ל is only syllabic before a
+# consonant that doesn't itself become ń, and י only stays a glide before
+# a vowel other than another י.
+PRE_TRANSLITERATION_REGEX = re.compile(
+    '(?P<zh>זש)'
+    '|(?P<tsh>טש)'
+    rf'|(?P<ng>(?<=[{VOWELS}])נ(?=[גכק]))'
+    rf'|(?P<syllabic_n>(?<![{VOWELS}])נ(?={CONSONANT}))'
+    rf'|(?P<syllabic_final_n>(?<![{VOWELS}])ן)'
+    rf'|(?P<syllabic_l>(?<![{VOWELS}])ל(?=$|(?!נ{CONSONANT}){CONSONANT}))'
+    '|(?P<i>[יj](?![אַעִאָוײײַױ]))'
+    '|(?P<y>[יj])'
+)
+PRE_TRANSLITERATION_REPLACEMENTS = {
+    'zh': 'ʒ',
+    'tsh': 'ʧ',
+    'ng': 'ŋ',
+    'syllabic_n': 'ń',
+    'syllabic_final_n': 'ń',
+    'syllabic_l': 'ł',
+    'i': 'i',
+    'y': 'y',
+}
+POST_TRANSLITERATION_TABLE = str.maketrans({
+    'ʒ': 'zh',
+    'ʧ': 'tsh',
+    'ŋ': 'ng',
+    'ń': 'en',
+    'ł': 'el',
+    '❓': 'TBD',
+})
+# regex's \w, unlike stdlib re's, counts combining marks as word characters
+NON_WORD_REGEX = regex.compile(r'\W+')
+# yiddish.transliterate results per character, filled in as characters are seen
+TRANSLITERATED_CHARS = {}
+
+CHUNK_SIZE = 1 << 20
+ZIP_SPOOL_SIZE = 64 << 20
+DOWNLOAD_WORKERS = 8
+CONVERT_WORKERS = os.cpu_count() or 1
+FFMPEG_BATCH_SIZE = 32
+PROCESSED_MARKER = '.processed'
+
+# Shared session so repeated downloads from the same host reuse connections
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                      max_retries=Retry(total=3, backoff_factor=0.3)))
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Download and prepare CSYE for Montreal Forced Aligner")
     parser.add_argument('output_directory', nargs='?', default='mfa_workspace', 
                         help="Directory to store all files (default: mfa_workspace)")
+    parser.add_argument('--force', action='store_true',
+                        help="Reprocess TextGrids even if they were fixed on a previous run")
     return parser.parse_args()
 
 # Functions for TextGrid downloading and organizing
 
 def download_and_extract_zip(url, extract_to):
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise Exception(f"Failed to download file, status code {response.status_code}")
-    
-    zip_file_stream = BytesIO(response.content)
-    
+    # Spool the archive to disk once it outgrows memory instead of buffering it whole
+    with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_SIZE) as zip_file_stream:
+        with SESSION.get(url, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download file, status code {response.status_code}")
+            response.raw.decode_content = True
+            shutil.copyfileobj(response.raw, zip_file_stream, length=CHUNK_SIZE)
+        zip_file_stream.seek(0)
+        extract_zip(zip_file_stream, extract_to)
+
+def extract_zip(zip_file_stream, extract_to):
     with zipfile.ZipFile(zip_file_stream, 'r') as zip_ref:
         # Zip contains a root folder we want to ignore
         top_level_dir = next((member.split('/')[0] for member in zip_ref.namelist()), None)
@@ -78,59 +161,129 @@ def download_and_extract_zip(url, extract_to):
                 new_path = os.path.join(extract_to, os.path.relpath(member, top_level_dir))
                 os.makedirs(os.path.dirname(new_path), exist_ok=True)
                 with zip_ref.open(member) as source, open(new_path, 'wb') as target:
-                    target.write(source.read())
+                    shutil.copyfileobj(source, target, length=CHUNK_SIZE)
                     
-def copy_and_rename_textgrid_files(src_dir, dest_dir):
+def copy_and_rename_textgrid_files(src_dir, dest_dir, processed):
     print(f"Copying and renaming TextGrid files (in Latin orthography) from {src_dir} to {dest_dir}")
     os.makedirs(dest_dir, exist_ok=True)
+    copied = {}
     
-    for filename in os.listdir(src_dir):
-        if filename.endswith(".la.TextGrid"):
-            src_path = os.path.join(src_dir, filename)
-            new_filename = filename.replace(".la", "")
-            dest_path = os.path.join(dest_dir, new_filename)
-            shutil.copy(src_path, dest_path)
+    with os.scandir(src_dir) as entries:
+        for src_entry in entries:
+            if src_entry.name.endswith(".la.TextGrid"):
+                new_filename = src_entry.name.replace(".la", "")
+                dest_path = os.path.join(dest_dir, new_filename)
+                source_sha1 = file_sha1(src_entry.path)
+
+                # Keep the fixed copy from a previous run if its source hasn't changed
+                entry = processed.get(new_filename)
+                if entry and entry['source'] == source_sha1 and os.path.exists(dest_path):
+                    continue
+                processed.pop(new_filename, None)
+                shutil.copy(src_entry.path, dest_path)
+                copied[dest_path] = source_sha1
+
+    return copied
+
+# Functions for tracking TextGrids fixed on previous runs
+
+def file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def load_processed_marker(corpus_dir):
+    # Maps each fixed TextGrid to the SHA-1 of its source and the words it contains
+    marker_path = os.path.join(corpus_dir, PROCESSED_MARKER)
+    if not os.path.exists(marker_path):
+        return {}
+    with open(marker_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_processed_marker(corpus_dir, processed):
+    with open(os.path.join(corpus_dir, PROCESSED_MARKER), 'w', encoding='utf-8') as f:
+        json.dump(processed, f, ensure_ascii=False)
 
 # Functions for audio downloading and conversion
 
 def download_csv(url):
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.text
+    with SESSION.get(url, stream=True) as response:
+        response.raise_for_status()
+        return response.text
 
 def download_audio_file(audio_link, file_name):
     if os.path.exists(file_name):
         print(f"{file_name} already exists; skipping download.")
     else:
         print(f"Downloading {os.path.basename(file_name)}")
-        response = requests.get(audio_link)
-        response.raise_for_status()  # Raises an HTTPError for bad requests
-        with open(file_name, 'wb') as file:
-            file.write(response.content)
-
-def convert_to_wav(m4a_file, wav_file):
-    if os.path.exists(wav_file):
-        print(f"     {os.path.basename(wav_file)} already exists; skipping conversion.")
-    else:
+        with SESSION.get(audio_link, stream=True) as response:
+            response.raise_for_status()  # Raises an HTTPError for bad requests
+            # Download under a temporary name so an interrupted download isn't mistaken for a finished one
+            part_file = file_name + '.part'
+            with open(part_file, 'wb') as file:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    file.write(chunk)
+            os.replace(part_file, file_name)
+
+def convert_to_wav(file_pairs):
+    # One ffmpeg invocation converts every (m4a, wav) pair in the batch.
+    # Outputs go to temporary names and are only moved into place once ffmpeg
+    # succeeds, so a failed batch can't leave truncated .wav files behind
+    part_files = [wav_file + '.part.wav' for _, wav_file in file_pairs]
+    command = ['ffmpeg', '-loglevel', 'error', '-nostdin', '-y']
+    # Decode single-threaded: process_csv_and_download sizes batches so there
+    # is at least one per conversion worker, and those run in parallel
+    for m4a_file, _ in file_pairs:
+        command += ['-threads', '1', '-i', m4a_file]
+    for i, ((m4a_file, _), part_file) in enumerate(zip(file_pairs, part_files)):
         print(f"     Converting {os.path.basename(m4a_file)} to .wav")
-        subprocess.run([
-            'ffmpeg',
-            '-i', m4a_file,
-            '-ar', '44100',
-            wav_file,
-            '-loglevel', 'quiet'
-        ], check=True)
+        command += ['-map', f'{i}:a:0', '-ar', '44100', part_file]
+    try:
+        subprocess.run(command, check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.PIPE, bufsize=1 << 20)
+    except subprocess.CalledProcessError as e:
+        for part_file in part_files:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+        raise Exception(f"ffmpeg failed: {e.stderr.decode(errors='replace').strip()}") from e
+    for (_, wav_file), part_file in zip(file_pairs, part_files):
+        os.replace(part_file, wav_file)
 
 def process_csv_and_download(csv_content, m4a_dir, corpus_dir):
     csv_reader = csv.DictReader(csv_content.splitlines())
-    for row in csv_reader:
-        audio_link = row['AudioLink']
-        tape = row['Tape']
-        m4a_file = os.path.join(m4a_dir, f"{tape}.m4a")
-        wav_file = os.path.join(corpus_dir, f"{tape}.wav")
-        
-        download_audio_file(audio_link, m4a_file)
-        convert_to_wav(m4a_file, wav_file)
+
+    # Downloads are network-bound and conversions wait on ffmpeg subprocesses,
+    # so both run in thread pools
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as download_pool:
+        downloads = {}
+        for row in csv_reader:
+            audio_link = row['AudioLink']
+            tape = row['Tape']
+            m4a_file = os.path.join(m4a_dir, f"{tape}.m4a")
+            wav_file = os.path.join(corpus_dir, f"{tape}.wav")
+
+            future = download_pool.submit(download_audio_file, audio_link, m4a_file)
+            downloads[future] = (m4a_file, wav_file)
+
+        for future in as_completed(downloads):
+            future.result()
+
+    pending = []
+    for m4a_file, wav_file in downloads.values():
+        if os.path.exists(wav_file):
+            print(f"     {os.path.basename(wav_file)} already exists; skipping conversion.")
+        else:
+            pending.append((m4a_file, wav_file))
+
+    # Batch conversions to amortize ffmpeg startup while keeping argv bounded,
+    # but make enough batches to keep every conversion worker busy
+    batch_size = max(1, min(FFMPEG_BATCH_SIZE, math.ceil(len(pending) / CONVERT_WORKERS)))
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    with ThreadPoolExecutor(max_workers=CONVERT_WORKERS) as convert_pool:
+        for _ in convert_pool.map(convert_to_wav, batches):
+            pass
 
 # Functions for fixing brackets in transcripts
 
@@ -140,107 +293,98 @@ def wrap_words_in_brackets(text):
 
     def replace_bracketed(match):
         content = match.group(1).strip()
-        words_and_punctuation = re.findall(r"[\p{L}\-']+|[^\p{L}\s<>]+", content)
-        
+
         formatted_content = []
-        for i, item in enumerate(words_and_punctuation):
-            if re.match(r"[\p{L}\-']+", item):
-                formatted_content.append(f'<{item}>')
+        for token in TOKEN_REGEX.finditer(content):
+            if token.lastindex == 1:
+                formatted_content.append(f'<{token.group(1)}>')
             else:
                 if formatted_content:
-                    formatted_content[-1] += item
+                    formatted_content[-1] += token.group(2)
                 else:
-                    formatted_content.append(item)
+                    formatted_content.append(token.group(2))
         
         return ' '.join(formatted_content)
 
-    return re.sub(r'<([^>]+)>', replace_bracketed, text)
+    return BRACKETED_REGEX.sub(replace_bracketed, text)
+
+@lru_cache(maxsize=4096)
+def wrap_words_in_brackets_cached(text):
+    return wrap_words_in_brackets(text)
 
 def process_textgrid_file(file_path):
+    # Also returns the words in the rewritten labels, so the pronunciation
+    # dictionary can be built without parsing every TextGrid a second time
     tg = textgrid.openTextgrid(file_path, includeEmptyIntervals=True)
+    words = set()
     
     for tier in tg.tiers:
         new_entries = []
         for entry in tier.entries:
-            new_label = wrap_words_in_brackets(entry.label)
+            # Blank labels are common; skip the cache for them
+            if entry.label is None or entry.label.strip() == "":
+                new_label = ""
+            else:
+                new_label = wrap_words_in_brackets_cached(entry.label)
             new_entry = Interval(entry.start, entry.end, new_label)
             new_entries.append(new_entry)
+            if new_label:
+                words.update(WORD_REGEX.findall(new_label))
         
         new_tier = textgrid.IntervalTier(tier.name, new_entries, minT=tier.minTimestamp, maxT=tier.maxTimestamp)
         tg.replaceTier(tier.name, new_tier)
     
     tg.save(file_path, format="long_textgrid", includeBlankSpaces=True)
     print(f"Processed and overwrote: {os.path.basename(file_path)}")
+    return words
 
 # Functions for creating pronunciation dictionary from all words in transcripts
 
+@lru_cache(maxsize=None)
 def yiddish_to_pronunciation(word):
-    pronunciation = word
-    pronunciation = re.sub('זש', 'ʒ', pronunciation)
-    pronunciation = re.sub('טש', 'ʧ', pronunciation)
-    pronunciation = re.sub(r'(?<=[אַעייִאָווּײײַױ])נ(?=[גכק])', 'ŋ', pronunciation)
-    pronunciation = re.sub(r'(?<![אַעייִאָווּײײַױ])נ(?=[בגדהװזטכלמנספּפֿצקרש])', 'ń', pronunciation)
-    pronunciation = re.sub(r'(?<![אַעייִאָווּײײַױ])ן', 'ń', pronunciation)
-    pronunciation = re.sub(r'(?<![אַעייִאָווּײײַױ])ל(?=[בגדהװזטכלמנספּפֿצקרש]|$)', 'ł', pronunciation)
-    pronunciation = re.sub('י', 'j', pronunciation)
-    pronunciation = re.sub(r'j(?![אַעייִאָוײײַױ])', 'i', pronunciation)
-    pronunciation = re.sub('j', 'y', pronunciation)
-
-    pronunciation = ' '.join([yiddish.transliterate(c) for c in pronunciation])
-    pronunciation = re.sub('ʒ', 'zh', pronunciation)
-    pronunciation = re.sub('ʧ', 'tsh', pronunciation)
-    pronunciation = re.sub('ŋ', 'ng', pronunciation)
-    pronunciation = re.sub('ń', 'en', pronunciation)
-    pronunciation = re.sub('ł', 'el', pronunciation)
-    pronunciation = re.sub('❓', 'TBD', pronunciation)
-
-    pronunciation = re.sub('[^\w ]', '', pronunciation)
-    pronunciation = re.sub(r' +', ' ', pronunciation)
+    pronunciation = PRE_TRANSLITERATION_REGEX.sub(
+        lambda match: PRE_TRANSLITERATION_REPLACEMENTS[match.lastgroup], word)
+
+    pronunciation = ' '.join([TRANSLITERATED_CHARS[c] if c in TRANSLITERATED_CHARS
+                              else TRANSLITERATED_CHARS.setdefault(c, yiddish.transliterate(c))
+                              for c in pronunciation])
+    pronunciation = pronunciation.translate(POST_TRANSLITERATION_TABLE)
+    # Drop punctuation, collapsing any run that contained a space to one space
+    pronunciation = NON_WORD_REGEX.sub(lambda match: ' ' if ' ' in match.group() else '', pronunciation)
     pronunciation = pronunciation.strip()
 
     return pronunciation
 
-def create_pronunciation_dictionary(corpus_dir, output_dict_file):
-    unique_words = set()
+def needs_tbd(word):
+    # We'll skip if word is ALLCAPS, geMIXt, or a filler
+    if not LOWERCASE_REGEX.search(word) or CAPS_RUN_REGEX.search(word):
+        return True
+    if '<' in word or '>' in word:
+        word = word.translate(STRIP_BRACKETS_TABLE)
+    return word in FILLERS
 
-    for filename in os.listdir(corpus_dir):
-        if filename.endswith(".TextGrid"):
-            filepath = os.path.join(corpus_dir, filename)
-            tg = textgrid.openTextgrid(filepath, includeEmptyIntervals=True)
-
-            for tier_name in tg.tierNames:
-                tier = tg.getTier(tier_name)
-                if isinstance(tier, textgrid.IntervalTier):
-                    for _, _, label in tier.entries:
-                        if label:
-                            words = WORD_REGEX.findall(label)
-                            unique_words.update(words)
-
-    sorted_words = sorted(unique_words)
-    pronunciation_dictionary = {}
-
-    for word in sorted_words:
-        if word not in pronunciation_dictionary:
-            pronunciation_dictionary[word] = ''
-        
-        # We'll skip if word is ALLCAPS, geMIXt, or a filler
-        if not re.search(r'[a-z]', word) or re.search('[A-Z]{2,}', word) or re.sub(r'[<>]', '', word) in FILLERS:
-            pronunciation_dictionary[word] = 'TBD'
-        else:
-            detransliterated = yiddish.replace_punctuation(yiddish.detransliterate(word.replace("UNK", "❓").lower(), loshn_koydesh=False))
-            phonemes = yiddish_to_pronunciation(detransliterated).split()
-            pronunciation_dictionary[word] = ' '.join(phonemes)
+def create_pronunciation_dictionary(unique_words, output_dict_file):
+    @lru_cache(maxsize=None)
+    def detransliterate(word):
+        return yiddish.replace_punctuation(yiddish.detransliterate(word, loshn_koydesh=False))
+
+    def pronounce(word):
+        detransliterated = detransliterate(word.replace("UNK", "❓").lower())
+        phonemes = yiddish_to_pronunciation(detransliterated).split()
+        return ' '.join(phonemes)
 
-    dictionary_string = '\n'.join(f'{word}\t{pronunciation_dictionary[word]}' for word in sorted(pronunciation_dictionary.keys()) if pronunciation_dictionary[word] != 'TBD')
+    # Words are already unique, so each one is looked up exactly once
+    pronunciation_dictionary = {word: 'TBD' if needs_tbd(word) else pronounce(word) for word in unique_words}
 
     with open(output_dict_file, 'w') as f:
-        f.write(dictionary_string)
+        f.writelines(f'{word}\t{pronunciation}\n' for word, pronunciation in sorted(pronunciation_dictionary.items())
+                     if pronunciation != 'TBD')
 
     print(f"\tPronunciation saved to {output_dict_file}")
 
 # Main function
 
-def main(output_directory):
+def main(output_directory, force=False):
     corpus_dir = os.path.join(output_directory, 'csye')
     m4a_dir = os.path.join(output_directory, 'm4a')
     transcripts_dir = os.path.join(output_directory, 'CSYE-Transcripts')
@@ -250,8 +394,9 @@ def main(output_directory):
     # Step 1: TextGrid processing
     print("Starting TextGrid processing...")
     os.makedirs(corpus_dir, exist_ok=True)
+    processed = {} if force else load_processed_marker(corpus_dir)
     download_and_extract_zip(TRANSCRIPTS_ZIP_URL, transcripts_dir)
-    copy_and_rename_textgrid_files(os.path.join(transcripts_dir, 'TextGrid'), corpus_dir)
+    copied = copy_and_rename_textgrid_files(os.path.join(transcripts_dir, 'TextGrid'), corpus_dir, processed)
     
     # Step 2: Audio processing
     print("Starting audio processing...")
@@ -261,14 +406,25 @@ def main(output_directory):
 
     # Step 3: Fix brackets in transcripts
     print("Fixing brackets in transcripts...")
-    for filename in os.listdir(corpus_dir):
-        if filename.endswith('.TextGrid'):
-            file_path = os.path.join(corpus_dir, filename)
-            process_textgrid_file(file_path)
+    with os.scandir(corpus_dir) as entries:
+        textgrids = [entry for entry in entries if entry.name.endswith('.TextGrid')]
+    processed = {entry.name: processed[entry.name] for entry in textgrids if entry.name in processed}
+    file_paths = [entry.path for entry in textgrids if entry.name not in processed]
+    if processed:
+        print(f"\t{len(processed)} TextGrids already fixed on a previous run; skipping.")
+    # Label rewriting is CPU-bound Python, so spread the files across processes
+    with ProcessPoolExecutor() as executor:
+        for file_path, words in zip(file_paths, executor.map(process_textgrid_file, file_paths, chunksize=4)):
+            processed[os.path.basename(file_path)] = {'source': copied.get(file_path), 'words': sorted(words)}
+    save_processed_marker(corpus_dir, processed)
+
+    unique_words = set()
+    for entry in processed.values():
+        unique_words.update(entry['words'])
 
     # Step 4: Create pronunciation dictionary and config file
     print("Creating pronunciation dictionary and config file...")
-    create_pronunciation_dictionary(corpus_dir, output_dict_file)
+    create_pronunciation_dictionary(unique_words, output_dict_file)
     with open(output_config_file, 'w') as f:
         f.write('ignore_case: false\npunctuation: 、。।，@""(),.:;¿?¡!\&%#*~【】，…‥「」『』〝〟″⟨⟩♪・‹›«»～′$+=')
     print(f"\tMFA config file saved to {output_config_file}")
@@ -277,4 +433,7 @@ def main(output_directory):
 
 if __name__ == '__main__':
     args = parse_arguments()
-    main(args.output_directory)
\ No newline at end of file
+    try:
+        main(args.output_directory, args.force)
+    finally:
+        SESSION.close()
\ No newline at end of file